@@ -51,6 +51,9 @@ class parkingSim():
 
         self.is_recording = False
 
+        # Snapshot layout: pose, target, prev_distance, row choice and the two rows of parked cars
+        self.STATE_SIZE = 17
+
     def move(self, x, y, angle, command):
         # Calculate the direction vector based on the angle
         direction_vector = (math.cos(angle), math.sin(angle))
@@ -220,6 +223,11 @@ class parkingSim():
             self.CENTER_X = (_index - 1) * self.PARKING_LANE_WIDTH + int(self.PARKING_LANE_WIDTH / 2)
             self.CENTER_Y = self.HEIGHT - int(self.PARKING_LANE_HEIGHT / 2)
 
+        self._place_cars()
+
+    def _place_cars(self):
+        # Build the parked car rectangles from the upper and lower row layouts
+        self.cars_list = []
         for i in range(0, 5):
             if self.upper_row[i] == 0:
                 continue
@@ -306,10 +314,6 @@ class parkingSim():
     def step(self, action):
         if self.is_recording:
             time.sleep(1/120)
-        reward = 1
-        obs = None
-        terminated = False
-        truncated = False
 
         action_name = self.ACTIONS_LIST[action]
 
@@ -319,6 +323,15 @@ class parkingSim():
         # Update the game state
         obs = self._get_state()
 
+        reward, terminated, truncated = self._evaluate()
+
+        return obs, reward, terminated, truncated
+
+    def _evaluate(self):
+        reward = 1
+        terminated = False
+        truncated = False
+
         # Calculate a bounding rectangle for the player's car
         player_poly_points = self.rotate_rectangle(center=(self.PLAYER_X, self.PLAYER_Y), width=self.CAR_HEIGHT, height=self.CAR_WIDTH, angle=self.PLAYER_ANGLE)
         player_rect_top, player_rect_left, player_rect_width, player_rect_height = self.bounding_rectangle(player_poly_points)
@@ -348,7 +361,166 @@ class parkingSim():
 
         self.prev_distance = current_distance
 
-        return obs, reward, terminated, truncated
+        return reward, terminated, truncated
+
+    def simulate(self, action):
+        # Same transition as step() but without drawing or ray casting, for planners
+        action_name = self.ACTIONS_LIST[action]
+        self.PLAYER_X, self.PLAYER_Y, self.PLAYER_ANGLE = self.move(self.PLAYER_X, self.PLAYER_Y, self.PLAYER_ANGLE, action_name)
+        return self._evaluate()
+
+    def get_state(self):
+        """
+        Capture the full dynamic state of the simulation.
+
+        Returns:
+            np.ndarray: Array of STATE_SIZE floats laid out as [PLAYER_X, PLAYER_Y, PLAYER_ANGLE,
+            CENTER_X, CENTER_Y, prev_distance, row_choice, upper_row (5), lower_row (5)].
+        """
+        if self.row_choice is None or self.upper_row is None or self.lower_row is None:
+            raise ValueError("get_state() needs a parking layout, call reset() or set_state() first")
+        state = np.empty(self.STATE_SIZE, dtype=np.float64)
+        state[0:6] = (self.PLAYER_X, self.PLAYER_Y, self.PLAYER_ANGLE, self.CENTER_X, self.CENTER_Y, self.prev_distance)
+        state[6] = self.row_choice
+        state[7:12] = self.upper_row
+        state[12:17] = self.lower_row
+        return state
+
+    def set_state(self, state):
+        """
+        Restore a state captured by get_state() without touching the pygame display.
+
+        Args:
+            state (np.ndarray): Array of STATE_SIZE floats from get_state().
+        """
+        self.PLAYER_X = float(state[0])
+        self.PLAYER_Y = float(state[1])
+        self.PLAYER_ANGLE = float(state[2])
+        self.CENTER_X = int(state[3])
+        self.CENTER_Y = int(state[4])
+        self.prev_distance = float(state[5])
+        self.row_choice = int(state[6])
+
+        # Only rebuild the parked cars when the layout actually changed
+        upper_row = np.asarray(state[7:12]).astype(int)
+        lower_row = np.asarray(state[12:17]).astype(int)
+        if self.upper_row is None or self.lower_row is None or \
+                not np.array_equal(upper_row, self.upper_row) or not np.array_equal(lower_row, self.lower_row):
+            self.upper_row = upper_row
+            self.lower_row = lower_row
+            self._place_cars()
+
+    def rollout_batch(self, state, action_sequences):
+        """
+        Branch one state into many action sequences and simulate them all at once.
+
+        Each branch stops accumulating reward once it terminates or is truncated,
+        exactly as an episode driven by step() would end. Nothing is drawn.
+
+        Args:
+            state (np.ndarray): Start state from get_state().
+            action_sequences (np.ndarray): Action indices of shape (no_of_branches, horizon).
+
+        Returns:
+            tuple: (total_rewards, final_states, terminated, truncated, lengths) where final_states
+            has shape (no_of_branches, STATE_SIZE) and can be passed to set_state().
+        """
+        action_sequences = np.atleast_2d(np.asarray(action_sequences, dtype=int))
+        if action_sequences.ndim != 2:
+            raise ValueError("action_sequences must have shape (no_of_branches, horizon), got %s"
+                             % (action_sequences.shape,))
+        if action_sequences.size > 0 and (action_sequences.min() < 0 or action_sequences.max() >= self.no_of_actions):
+            raise ValueError("Action indices must be in [0, %d), got values in [%d, %d]"
+                             % (self.no_of_actions, action_sequences.min(), action_sequences.max()))
+        no_of_branches, horizon = action_sequences.shape
+        state = np.asarray(state, dtype=np.float64)
+        if state.shape != (self.STATE_SIZE,):
+            raise ValueError("Expected a state of shape (%d,) from get_state(), got %s" % (self.STATE_SIZE, state.shape))
+
+        # Turning and driving direction of every action in ACTIONS_LIST
+        angle_steps = np.array([0, -1, 1, 0, -1, 1]) * self.PLAYER_ANGLE_STEP
+        directions = np.array([1, 1, 1, -1, -1, -1])
+
+        # Parked cars as [left, top, width, height] from the state's layout
+        upper_row = state[7:12].astype(int)
+        lower_row = state[12:17].astype(int)
+        cars = []
+        for i in range(0, 5):
+            if upper_row[i] != 0:
+                cars.append([(i) * self.PARKING_LANE_WIDTH + 30, 5, self.CAR_WIDTH, self.CAR_HEIGHT])
+        for i in range(0, 5):
+            if lower_row[i] != 0:
+                cars.append([(i) * self.PARKING_LANE_WIDTH + 30, self.HEIGHT - self.CAR_HEIGHT - 5, self.CAR_WIDTH, self.CAR_HEIGHT])
+        cars = np.array(cars, dtype=float).reshape(-1, 4)
+
+        # Corners of the player's car around its center before rotation, as in rotate_rectangle
+        half_width = self.CAR_HEIGHT / 2
+        half_height = self.CAR_WIDTH / 2
+        corner_x = np.array([-half_width, half_width, half_width, -half_width])
+        corner_y = np.array([-half_height, -half_height, half_height, half_height])
+
+        x = np.full(no_of_branches, state[0])
+        y = np.full(no_of_branches, state[1])
+        angle = np.full(no_of_branches, state[2])
+        prev_distance = np.full(no_of_branches, state[5])
+        center_x, center_y = state[3], state[4]
+
+        total_rewards = np.zeros(no_of_branches)
+        terminated = np.zeros(no_of_branches, dtype=bool)
+        truncated = np.zeros(no_of_branches, dtype=bool)
+        lengths = np.zeros(no_of_branches, dtype=int)
+        alive = np.ones(no_of_branches, dtype=bool)
+
+        for t in range(horizon):
+            if not alive.any():
+                break
+            actions = action_sequences[:, t]
+
+            # Move every live branch, same update as move()
+            new_angle = np.where(alive, angle + angle_steps[actions], angle)
+            step = np.where(alive, directions[actions] * self.PLAYER_STEP, 0)
+            x = x + step * np.cos(new_angle)
+            y = y + step * np.sin(new_angle)
+            angle = new_angle
+
+            # Rotated corners of the player's car, shape (no_of_branches, 4)
+            cos_a = np.cos(angle)[:, None]
+            sin_a = np.sin(angle)[:, None]
+            points_x = x[:, None] + corner_x * cos_a - corner_y * sin_a
+            points_y = y[:, None] + corner_x * sin_a + corner_y * cos_a
+
+            hit = ((points_x < 0) | (points_x > self.WIDTH) | (points_y < 0) | (points_y > self.HEIGHT)).any(axis=1)
+
+            # Bounding rectangle in pygame.Rect integer coordinates, then Rect.colliderect
+            left = np.trunc(points_x.min(axis=1))
+            top = np.trunc(points_y.min(axis=1))
+            width = np.trunc(points_x.max(axis=1) - points_x.min(axis=1))
+            height = np.trunc(points_y.max(axis=1) - points_y.min(axis=1))
+            if len(cars) > 0:
+                overlap = (left[:, None] < cars[:, 0] + cars[:, 2]) & (cars[:, 0] < (left + width)[:, None]) & \
+                          (top[:, None] < cars[:, 1] + cars[:, 3]) & (cars[:, 1] < (top + height)[:, None])
+                hit |= overlap.any(axis=1) & (width > 0) & (height > 0)
+
+            # Rewards follow _evaluate(), where the distance reward overrides the collision one
+            current_distance = np.sqrt((center_x - x) ** 2 + (center_y - y) ** 2)
+            reward = np.where(current_distance < prev_distance, 1, -5)
+            parked = current_distance < self.MIN_DISTANCE
+            reward = np.where(parked, 1000, reward)
+            prev_distance = np.where(alive, current_distance, prev_distance)
+
+            total_rewards += np.where(alive, reward, 0)
+            lengths += alive
+            terminated |= alive & hit
+            truncated |= alive & parked
+            alive &= ~(hit | parked)
+
+        final_states = np.tile(state, (no_of_branches, 1))
+        final_states[:, 0] = x
+        final_states[:, 1] = y
+        final_states[:, 2] = angle
+        final_states[:, 5] = prev_distance
+
+        return total_rewards, final_states, terminated, truncated, lengths
 
     def reset(self):
         pygame.init()
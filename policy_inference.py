@@ -0,0 +1,198 @@
+import numpy as np
+import copy
+import threading
+import queue
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+def export_policy(policy_net, path):
+    """
+    Export the weights of a trained DQN to a plain NumPy archive.
+
+    Args:
+        policy_net (nn.Module): Trained DQN made of nn.Linear layers with ReLU in between.
+        path (str): Destination .npz file.
+
+    Returns:
+        int: Number of linear layers written.
+    """
+    state_dict = policy_net.state_dict()
+
+    # state_dict keeps the layers in definition order (layer1 ... layer6)
+    arrays = {}
+    no_of_layers = 0
+    for key in state_dict:
+        if not key.endswith(".weight"):
+            continue
+        prefix = key[:-len(".weight")]
+        arrays["W%d" % no_of_layers] = state_dict[prefix + ".weight"].detach().cpu().numpy().astype(np.float32)
+        arrays["b%d" % no_of_layers] = state_dict[prefix + ".bias"].detach().cpu().numpy().astype(np.float32)
+        no_of_layers += 1
+
+    np.savez(path, no_of_layers=no_of_layers, **arrays)
+    return no_of_layers
+
+
+def export_torchscript(policy_net, path):
+    """
+    Export a trained DQN as a TorchScript module running on the CPU.
+
+    Args:
+        policy_net (nn.Module): Trained DQN.
+        path (str): Destination .pt file.
+    """
+    # Imported here so the NumPy runtime below never needs torch
+    import torch
+
+    # Script a copy so the caller's network keeps its device and training mode
+    scripted = torch.jit.script(copy.deepcopy(policy_net).to("cpu").eval())
+    scripted.save(path)
+
+
+class policyRuntime():
+    def __init__(self, path) -> None:
+        # Load the exported weights, transposed once so a forward pass is x @ W + b
+        archive = np.load(path)
+        no_of_layers = int(archive["no_of_layers"])
+        self.weights = [np.ascontiguousarray(archive["W%d" % i].T) for i in range(no_of_layers)]
+        self.biases = [archive["b%d" % i] for i in range(no_of_layers)]
+
+        self.n_observations = self.weights[0].shape[0]
+        self.n_actions = self.weights[-1].shape[1]
+
+    def q_values(self, states):
+        # Forward pass of the DQN, ReLU after every layer except the last
+        x = np.asarray(states, dtype=np.float32).reshape(-1, self.n_observations)
+        for W, b in zip(self.weights[:-1], self.biases[:-1]):
+            x = x @ W
+            x += b
+            np.maximum(x, 0, out=x)
+        return x @ self.weights[-1] + self.biases[-1]
+
+    def act_batch(self, states):
+        # Greedy action for every row, same as policy_net(state).max(1)[1]
+        return self.q_values(states).argmax(axis=1)
+
+    def act(self, state):
+        return int(self.act_batch(state)[0])
+
+
+class microBatcher():
+    def __init__(self, runtime, max_batch_size=64, max_wait=0.0, stats_window=10000) -> None:
+        # Requests already queued when a batch starts share one forward pass. A lone request
+        # is dispatched immediately; max_wait only applies once concurrent requests are seen.
+        self.runtime = runtime
+        self.MAX_BATCH_SIZE = max_batch_size
+        self.MAX_WAIT = max_wait
+
+        self.requests = queue.Queue()
+        # Latency statistics only cover the last stats_window requests and batches
+        self.STATS_WINDOW = stats_window
+        self.latencies = deque(maxlen=stats_window)
+        self.batch_sizes = deque(maxlen=stats_window)
+        self.no_of_requests = 0
+        self.lock = threading.Lock()
+
+        self.running = True
+        self.closed = False
+        self.worker = threading.Thread(target=self._serve, daemon=True)
+        self.worker.start()
+
+    def submit(self, state):
+        # Returns a Future resolving to the greedy action for this state
+        state = np.asarray(state, dtype=np.float32)
+        if state.size != self.runtime.n_observations:
+            raise ValueError("Expected a state with %d observations, got shape %s"
+                             % (self.runtime.n_observations, state.shape))
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("microBatcher is closed")
+            self.requests.put((state.reshape(-1), future, time.perf_counter()))
+        return future
+
+    def act(self, state):
+        return self.submit(state).result()
+
+    def _serve(self):
+        while self.running:
+            try:
+                first = self.requests.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if first is None:
+                break
+
+            # Take everything already queued, and only wait for more while other callers are active
+            batch = [first]
+            deadline = time.perf_counter() + self.MAX_WAIT
+            while len(batch) < self.MAX_BATCH_SIZE:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if len(batch) > 1 and remaining > 0:
+                        item = self.requests.get(timeout=remaining)
+                    else:
+                        item = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.running = False
+                    break
+                batch.append(item)
+
+            try:
+                states = np.stack([item[0] for item in batch])
+                actions = self.runtime.act_batch(states)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            with self.lock:
+                for (_, _, submitted) in batch:
+                    self.latencies.append(finished - submitted)
+                self.batch_sizes.append(len(batch))
+                self.no_of_requests += len(batch)
+            for (_, future, _), action in zip(batch, actions):
+                future.set_result(int(action))
+
+    def latency_report(self):
+        """
+        Summarise request latency over the last STATS_WINDOW requests.
+
+        Returns:
+            dict: p50/p99/max latency in milliseconds and mean batch size over the window,
+            plus the total number of requests served since the last reset.
+        """
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_sizes = np.array(self.batch_sizes)
+            no_of_requests = self.no_of_requests
+        if len(latencies) == 0:
+            return {"requests": 0, "p50_ms": None, "p99_ms": None, "max_ms": None, "mean_batch_size": None}
+        return {
+            "requests": no_of_requests,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            "mean_batch_size": float(batch_sizes.mean()),
+        }
+
+    def reset_stats(self):
+        with self.lock:
+            self.latencies.clear()
+            self.batch_sizes.clear()
+            self.no_of_requests = 0
+
+    def close(self):
+        # Requests submitted before close() are still answered
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.requests.put(None)
+        self.worker.join()
+        self.running = False
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+pytest.importorskip("pygame")
+
+from parking_simulation import parkingSim
+
+
+@pytest.fixture
+def env():
+    sim = parkingSim()
+    yield sim
+    sim.onDestroy()
+
+
+def test_set_state_round_trip(env):
+    np.random.seed(0)
+    env.reset()
+    for _ in range(10):
+        env.step(np.random.randint(env.no_of_actions))
+    state = env.get_state()
+    env.reset()
+    env.set_state(state)
+    np.testing.assert_array_equal(env.get_state(), state)
+
+
+def test_rollout_batch_matches_sequential_simulate(env):
+    np.random.seed(0)
+    for episode in range(10):
+        env.reset()
+        for _ in range(np.random.randint(0, 30)):
+            env.step(np.random.randint(env.no_of_actions))
+        start = env.get_state()
+
+        action_sequences = np.random.randint(0, env.no_of_actions, size=(64, 150))
+        # Straight runs reach walls and parked cars within the horizon
+        action_sequences[:8] = np.random.choice([0, 3], size=(8, 150))
+        rewards, final_states, terminated, truncated, lengths = env.rollout_batch(start, action_sequences)
+
+        for b in range(len(action_sequences)):
+            env.set_state(start)
+            total, term, trunc, n = 0, False, False, 0
+            for action in action_sequences[b]:
+                reward, term, trunc = env.simulate(int(action))
+                total += reward
+                n += 1
+                if term or trunc:
+                    break
+            assert (total, term, trunc, n) == (rewards[b], terminated[b], truncated[b], lengths[b])
+            np.testing.assert_allclose(env.get_state(), final_states[b])
+
+
+def test_get_state_before_reset_raises():
+    with pytest.raises(ValueError, match="reset"):
+        parkingSim().get_state()
+
+
+@pytest.mark.parametrize("action", [-1, 6])
+def test_rollout_batch_rejects_invalid_actions(env, action):
+    env.reset()
+    with pytest.raises(ValueError, match="Action indices"):
+        env.rollout_batch(env.get_state(), [[0, action]])
@@ -0,0 +1,139 @@
+import random
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from training_checkpoint import mmapReplayMemory, checkpointer
+
+N_OBSERVATIONS = 13
+
+
+def push_transitions(memory, n):
+    for _ in range(n):
+        next_state = None if random.random() < 0.2 else torch.randn(1, N_OBSERVATIONS)
+        memory.push(torch.randn(1, N_OBSERVATIONS), torch.tensor([[random.randrange(6)]]),
+                    next_state, torch.tensor([random.choice([1, -5, 1000])]))
+
+
+def make_training(memory):
+    torch.manual_seed(0)
+    policy_net = torch.nn.Linear(N_OBSERVATIONS, 6)
+    target_net = torch.nn.Linear(N_OBSERVATIONS, 6)
+    optimizer = torch.optim.AdamW(policy_net.parameters(), lr=1e-3, amsgrad=True)
+    return policy_net, target_net, optimizer, memory
+
+
+def contents(memory):
+    # Every valid row, sampled with a fixed seed so two memories are read in the same order
+    random.seed(0)
+    batch, mask = memory.sample(len(memory))
+    return batch.state.numpy(), batch.action.numpy(), batch.reward.numpy(), mask.numpy(), batch.next_state.numpy()
+
+
+def assert_same_contents(a, b):
+    for x, y in zip(contents(a), contents(b)):
+        np.testing.assert_array_equal(x, y)
+
+
+def train(directory, no_of_checkpoints, pushes_per_checkpoint, capacity=100):
+    memory = mmapReplayMemory(capacity, N_OBSERVATIONS, directory)
+    policy_net, target_net, optimizer, memory = make_training(memory)
+    ckpt = checkpointer(str(directory / "training.pt"))
+    random.seed(3)
+    np.random.seed(3)
+    torch.manual_seed(3)
+    for k in range(no_of_checkpoints):
+        push_transitions(memory, pushes_per_checkpoint)
+        ckpt.save(policy_net, target_net, optimizer, memory, k)
+    ckpt.wait()
+    return memory, ckpt
+
+
+def resume(directory, capacity=100):
+    memory = mmapReplayMemory(capacity, N_OBSERVATIONS, directory)
+    policy_net, target_net, optimizer, memory = make_training(memory)
+    ckpt = checkpointer(str(directory / "training.pt"))
+    steps_done, extra = ckpt.load(policy_net, target_net, optimizer, memory)
+    return memory, steps_done
+
+
+def test_rows_pushed_after_checkpoint_do_not_leak_into_resume(tmp_path):
+    memory, _ = train(tmp_path, 3, 40)
+    expected = contents(memory)
+
+    # Training goes on past the checkpoint and wraps the ring before the crash
+    push_transitions(memory, 150)
+
+    resumed, steps_done = resume(tmp_path)
+    assert steps_done == 2
+    assert len(resumed) == 100
+    for x, y in zip(expected, contents(resumed)):
+        np.testing.assert_array_equal(x, y)
+
+
+def test_resume_after_ring_wrap_is_exact(tmp_path):
+    memory, _ = train(tmp_path, 7, 45)
+    resumed, _ = resume(tmp_path)
+    assert resumed.position == memory.position
+    assert_same_contents(memory, resumed)
+
+    # Both continue identically, the RNG streams were restored with the replay memory
+    random.seed(5)
+    torch.manual_seed(5)
+    push_transitions(memory, 30)
+    random.seed(5)
+    torch.manual_seed(5)
+    push_transitions(resumed, 30)
+    assert_same_contents(memory, resumed)
+
+
+def test_discard_snapshot_then_next_save_recovers_all_rows(tmp_path, monkeypatch):
+    memory, ckpt = train(tmp_path, 2, 30)
+    policy_net, target_net, optimizer, _ = make_training(memory)
+
+    # The next write fails, training continues and the following save must still succeed
+    push_transitions(memory, 40)
+    original_save = torch.save
+    monkeypatch.setattr(torch, "save", lambda *args, **kwargs: (_ for _ in ()).throw(OSError("disk full")))
+    ckpt.save(policy_net, target_net, optimizer, memory, 10)
+    ckpt.writer.join()
+    monkeypatch.setattr(torch, "save", original_save)
+
+    push_transitions(memory, 50)
+    with pytest.warns(UserWarning, match="disk full"):
+        ckpt.save(policy_net, target_net, optimizer, memory, 11)
+    ckpt.wait()
+    expected = contents(memory)
+
+    resumed, steps_done = resume(tmp_path)
+    assert steps_done == 11
+    for x, y in zip(expected, contents(resumed)):
+        np.testing.assert_array_equal(x, y)
+
+
+def test_final_wait_raises_failed_write(tmp_path, monkeypatch):
+    memory = mmapReplayMemory(10, N_OBSERVATIONS, tmp_path)
+    policy_net, target_net, optimizer, memory = make_training(memory)
+    ckpt = checkpointer(str(tmp_path / "training.pt"))
+    monkeypatch.setattr(torch, "save", lambda *args, **kwargs: (_ for _ in ()).throw(OSError("disk full")))
+    ckpt.save(policy_net, target_net, optimizer, memory, 0)
+    with pytest.raises(OSError):
+        ckpt.wait()
+
+
+def test_mismatched_file_shape_raises(tmp_path):
+    mmapReplayMemory(100, N_OBSERVATIONS, tmp_path)
+    with pytest.raises(ValueError, match="delete"):
+        mmapReplayMemory(100, N_OBSERVATIONS + 1, tmp_path)
+    with pytest.raises(ValueError, match="delete"):
+        mmapReplayMemory(50, N_OBSERVATIONS, tmp_path)
+
+
+def test_mismatched_checkpoint_raises(tmp_path):
+    memory, _ = train(tmp_path / "a", 1, 10)
+    state_dict = memory.snapshot()
+    other = mmapReplayMemory(100, N_OBSERVATIONS, tmp_path / "b")
+    with pytest.raises(ValueError, match="n_observations"):
+        other.load_state_dict(dict(state_dict, n_observations=N_OBSERVATIONS + 1))
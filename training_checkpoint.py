@@ -0,0 +1,359 @@
+import numpy as np
+import torch
+import random
+import mmap
+import os
+import threading
+import warnings
+from collections import namedtuple
+
+Transition = namedtuple('Transition',
+                        ('state', 'action', 'next_state', 'reward'))
+
+
+FIELDS = ("states", "next_states", "actions", "rewards", "non_final")
+
+
+class mmapReplayMemory():
+    def __init__(self, capacity, n_observations, directory, device="cpu") -> None:
+        # Replay memory backed by .npy files. The files only ever hold rows covered by a
+        # checkpoint: new pushes are staged in memory, each checkpoint stores the rows staged
+        # since the previous one, and those rows are written into the files once that
+        # checkpoint is safely on disk. A resume therefore never sees rows pushed after its
+        # checkpoint, and a crash in push() cannot leave a half-written row in the files.
+        self.capacity = capacity
+        self.n_observations = n_observations
+        self.directory = directory
+        self.device = device
+
+        os.makedirs(directory, exist_ok=True)
+        self.created = False
+        self.maps = []
+        self.states = self._open("states", (capacity, n_observations), np.float32)
+        self.next_states = self._open("next_states", (capacity, n_observations), np.float32)
+        self.actions = self._open("actions", (capacity,), np.int64)
+        self.rewards = self._open("rewards", (capacity,), np.float32)
+        self.non_final = self._open("non_final", (capacity,), np.bool_)
+        self.arrays = [self.states, self.next_states, self.actions, self.rewards, self.non_final]
+
+        # Rows pushed since the last checkpoint, staged row k belongs at ring index start + k
+        self.current = self._new_generation(0)
+        # Rows of the last checkpoint still to be written into the files, and rows to flush
+        self.pending = None
+        self.dirty_segments = []
+
+        # Ring buffer position and number of valid rows
+        self.position = 0
+        self.count = 0
+
+    def _open(self, name, shape, dtype):
+        # Map the .npy file ourselves so flush() works on an mmap object we own
+        path = os.path.join(self.directory, name + ".npy")
+        if not os.path.exists(path):
+            self.created = True
+            np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+        f = open(path, "r+b")
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            file_shape, fortran_order, file_dtype = np.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            file_shape, fortran_order, file_dtype = np.lib.format.read_array_header_2_0(f)
+        else:
+            raise ValueError("Replay file %s has unsupported .npy version %s" % (path, version))
+        if file_shape != shape or file_dtype != np.dtype(dtype) or fortran_order:
+            raise ValueError("Replay file %s holds %s %s, expected %s %s; delete %s to start a new replay memory"
+                             % (path, file_shape, file_dtype, shape, np.dtype(dtype), self.directory))
+
+        header_size = f.tell()
+        file_map = mmap.mmap(f.fileno(), 0)
+        array = np.ndarray(shape, dtype=dtype, buffer=file_map, offset=header_size)
+        self.maps.append((f, file_map, header_size, array.strides[0]))
+        return array
+
+    def _new_generation(self, start, size=0):
+        rows = {}
+        for array, name in zip(self.arrays, FIELDS):
+            rows[name] = np.zeros((size,) + array.shape[1:], dtype=array.dtype)
+        return {"start": start, "count": 0, "rows": rows}
+
+    def push(self, state, action, next_state, reward):
+        """Save a transition"""
+        current = self.current
+        k = current["count"] % self.capacity
+        rows = current["rows"]
+        if k >= len(rows["actions"]):
+            # Grow the staging area, it never needs more rows than the capacity
+            size = min(self.capacity, max(1024, 2 * len(rows["actions"])))
+            for name in FIELDS:
+                grown = np.zeros((size,) + rows[name].shape[1:], dtype=rows[name].dtype)
+                grown[:len(rows[name])] = rows[name]
+                rows[name] = grown
+
+        rows["states"][k] = state.detach().cpu().numpy().reshape(-1)
+        rows["actions"][k] = int(action.item())
+        rows["rewards"][k] = float(reward.item())
+        if next_state is None:
+            rows["non_final"][k] = False
+            rows["next_states"][k] = 0
+        else:
+            rows["non_final"][k] = True
+            rows["next_states"][k] = next_state.detach().cpu().numpy().reshape(-1)
+        current["count"] += 1
+
+        self.position = (self.position + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _overlay(self, generation, indices, gathered):
+        # Replace gathered rows with the ones a generation holds for the same ring indices
+        n = min(generation["count"], self.capacity)
+        if n == 0:
+            return
+        offsets = (indices - generation["start"]) % self.capacity
+        hit = offsets < n
+        if hit.any():
+            for values, name in zip(gathered, FIELDS):
+                values[hit] = generation["rows"][name][offsets[hit]]
+
+    def sample(self, batch_size):
+        """
+        Sample a batch of transitions, gathered with one copy per field.
+
+        Returns:
+            tuple: (Transition, non_final_mask) where state, action and reward hold the whole
+            batch and next_state only holds the rows where non_final_mask is True.
+        """
+        # Same sampling stream as ReplayMemory, which used random.sample as well
+        indices = np.array(random.sample(range(self.count), batch_size))
+        gathered = [array[indices] for array in self.arrays]
+
+        # Rows not written to the files yet, the current generation is the most recent
+        if self.pending is not None:
+            self._overlay(self.pending, indices, gathered)
+        self._overlay(self.current, indices, gathered)
+        states, next_states, actions, rewards, non_final = gathered
+
+        non_final_mask = torch.from_numpy(non_final).to(self.device)
+        batch = Transition(torch.from_numpy(states).to(self.device),
+                           torch.from_numpy(actions).unsqueeze(1).to(self.device),
+                           torch.from_numpy(next_states[non_final]).to(self.device),
+                           torch.from_numpy(rewards).to(self.device))
+        return batch, non_final_mask
+
+    def _segments(self, start, count):
+        # Ring buffer rows [start, start + count) as at most two contiguous ranges
+        count = min(count, self.capacity)
+        if count == 0:
+            return []
+        stop = start + count
+        if stop <= self.capacity:
+            return [(start, stop)]
+        return [(start, self.capacity), (0, stop - self.capacity)]
+
+    def _write_rows(self, generation):
+        # Write checkpointed rows into the files and remember which pages need flushing
+        n = min(generation["count"], self.capacity)
+        indices = (generation["start"] + np.arange(n)) % self.capacity
+        for array, name in zip(self.arrays, FIELDS):
+            array[indices] = generation["rows"][name][:n]
+        self.dirty_segments += self._segments(generation["start"], n)
+
+    def snapshot(self):
+        """
+        Hand the rows staged since the previous checkpoint over to a new checkpoint.
+
+        Must only be called once the previous checkpoint is on disk, since it writes that
+        checkpoint's rows into the files.
+
+        Returns:
+            dict: Replay state to store in the checkpoint, including the staged rows.
+        """
+        if self.pending is not None:
+            self._write_rows(self.pending)
+
+        n = min(self.current["count"], self.capacity)
+        self.pending = {"start": self.current["start"], "count": self.current["count"],
+                        "rows": {name: rows[:n] for name, rows in self.current["rows"].items()}}
+        self.current = self._new_generation(self.position)
+
+        return {"position": self.position, "count": self.count, "capacity": self.capacity,
+                "n_observations": self.n_observations, "rows": self.pending}
+
+    def discard_snapshot(self):
+        # The last checkpoint was never written, fold its rows back into the current generation
+        if self.pending is None:
+            return
+        pending, current = self.pending, self.current
+        merged = self._new_generation(pending["start"], min(self.capacity, pending["count"] + current["count"]))
+        merged["count"] = pending["count"] + current["count"]
+
+        n_pending = min(pending["count"], self.capacity)
+        n_current = min(current["count"], self.capacity)
+        offsets = (pending["count"] + np.arange(n_current)) % self.capacity
+        for name in FIELDS:
+            merged["rows"][name][:n_pending] = pending["rows"][name][:n_pending]
+            merged["rows"][name][offsets] = current["rows"][name][:n_current]
+
+        self.current = merged
+        self.pending = None
+
+    def _flush_rows(self, file_map, header_size, row_bytes, start, stop):
+        # Flush only the pages covering rows [start, stop) of one mapped file
+        begin = header_size + start * row_bytes
+        end = header_size + stop * row_bytes
+        aligned = begin - begin % mmap.PAGESIZE
+        file_map.flush(aligned, end - aligned)
+
+    def flush(self):
+        """
+        Flush the rows written into the files since the last flush.
+
+        Returns:
+            int: Number of rows flushed.
+        """
+        segments = self.dirty_segments
+        for _, file_map, header_size, row_bytes in self.maps:
+            for start, end in segments:
+                self._flush_rows(file_map, header_size, row_bytes, start, end)
+        # Only forget the segments once they are on disk, so a failed flush is retried
+        self.dirty_segments = self.dirty_segments[len(segments):]
+        return sum(end - start for start, end in segments)
+
+    def load_state_dict(self, state_dict):
+        if state_dict["capacity"] != self.capacity:
+            raise ValueError("Replay memory capacity %d does not match checkpoint capacity %d"
+                             % (self.capacity, state_dict["capacity"]))
+        if state_dict["n_observations"] != self.n_observations:
+            raise ValueError("Replay memory n_observations %d does not match checkpoint n_observations %d"
+                             % (self.n_observations, state_dict["n_observations"]))
+        if self.created and state_dict["count"] > min(state_dict["rows"]["count"], self.capacity):
+            raise ValueError("Replay files in %s were missing, the checkpoint cannot be restored"
+                             % self.directory)
+
+        # Reapply the checkpoint's rows, the files may have stopped just before them
+        self._write_rows(state_dict["rows"])
+        self.flush()
+
+        self.position = state_dict["position"]
+        self.count = state_dict["count"]
+        self.pending = None
+        self.current = self._new_generation(self.position)
+
+    def __len__(self):
+        return self.count
+
+
+def get_rng_states():
+    # Every random stream used by training: epsilon sampling, env layouts and torch
+    states = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        states["cuda"] = torch.cuda.get_rng_state_all()
+    if hasattr(torch, "mps") and torch.backends.mps.is_available():
+        states["mps"] = torch.mps.get_rng_state()
+    return states
+
+
+def set_rng_states(states):
+    random.setstate(states["python"])
+    np.random.set_state(states["numpy"])
+    torch.set_rng_state(states["torch"])
+    if "cuda" in states and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(states["cuda"])
+    if "mps" in states and hasattr(torch, "mps") and torch.backends.mps.is_available():
+        torch.mps.set_rng_state(states["mps"])
+
+
+def _cpu_copy(obj):
+    # Snapshot of a (possibly nested) state dict that training can no longer mutate
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {k: _cpu_copy(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_cpu_copy(v) for v in obj]
+    if isinstance(obj, tuple):
+        return tuple(_cpu_copy(v) for v in obj)
+    return obj
+
+
+class checkpointer():
+    def __init__(self, path) -> None:
+        self.path = path
+        self.writer = None
+        self.error = None
+        self.memory = None
+
+    def save(self, policy_net, target_net, optimizer, memory, steps_done, **extra):
+        """
+        Snapshot the full training state and write it on a background thread.
+
+        Weights, optimizer state, RNG streams and the replay rows pushed since the previous
+        checkpoint are copied before returning, so training can continue while the file is
+        being written. The replay files only flush the rows of the previous checkpoint.
+        """
+        # Only one write in flight, a new snapshot waits for the previous one
+        try:
+            self.wait()
+        except Exception as e:
+            # A failed write must not end the run, its replay rows go into this checkpoint instead
+            warnings.warn("Writing checkpoint %s failed (%r), retrying with this snapshot" % (self.path, e))
+
+        checkpoint = {
+            "policy_net": _cpu_copy(policy_net.state_dict()),
+            "target_net": _cpu_copy(target_net.state_dict()),
+            "optimizer": _cpu_copy(optimizer.state_dict()),
+            "memory": memory.snapshot(),
+            "steps_done": steps_done,
+            "rng": get_rng_states(),
+            "extra": extra,
+        }
+
+        self.memory = memory
+        self.writer = threading.Thread(target=self._write, args=(checkpoint, memory), daemon=True)
+        self.writer.start()
+
+    def _write(self, checkpoint, memory):
+        # Replay files first, so they never lag more than one checkpoint behind the file on disk
+        tmp_path = self.path + ".tmp"
+        try:
+            memory.flush()
+            # Write to a temporary file first so a crash never leaves a half-written checkpoint
+            torch.save(checkpoint, tmp_path)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.error = e
+
+    def wait(self):
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            self.memory.discard_snapshot()
+            raise error
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self, policy_net, target_net, optimizer, memory):
+        """
+        Restore a checkpoint written by save().
+
+        Returns:
+            tuple: (steps_done, extra) where extra holds the keyword arguments given to save().
+        """
+        self.wait()
+        checkpoint = torch.load(self.path, map_location="cpu", weights_only=False)
+
+        policy_net.load_state_dict(checkpoint["policy_net"])
+        target_net.load_state_dict(checkpoint["target_net"])
+        # load_state_dict moves the optimizer state onto the parameters' device
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        memory.load_state_dict(checkpoint["memory"])
+        set_rng_states(checkpoint["rng"])
+
+        return checkpoint["steps_done"], checkpoint["extra"]